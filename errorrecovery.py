@@ -20,25 +20,74 @@ Date: January 2026
 License: MIT
 """
 
-import argparse
+import atexit
+import builtins
+import functools
 import json
 import hashlib
+import random
 import re
 import sys
+import threading
 import time
-import traceback
-from dataclasses import dataclass, field, asdict
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timedelta
 from enum import Enum
+from json.encoder import encode_basestring_ascii as _encode_json_str
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, DefaultDict, Deque, Dict, FrozenSet, List, Optional, Tuple, Union
+
+try:
+    import orjson  # Optional: several times faster JSON (de)serialization
+except ImportError:
+    orjson = None
+
+try:
+    import hyperscan  # Optional: SIMD multi-regex scanning for large pattern sets
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick  # Optional: one-pass message_contains scanning (pyahocorasick)
+except ImportError:
+    ahocorasick = None
 
 # ============== CONSTANTS ==============
 VERSION = "1.0.0"
 DEFAULT_DATA_DIR = Path.home() / ".errorrecovery"
 DEFAULT_PATTERNS_FILE = DEFAULT_DATA_DIR / "patterns.json"
 DEFAULT_LEARNINGS_FILE = DEFAULT_DATA_DIR / "learnings.json"
-DEFAULT_HISTORY_FILE = DEFAULT_DATA_DIR / "history.json"
+DEFAULT_HISTORY_FILE = DEFAULT_DATA_DIR / "history.jsonl"
+
+# History file keeps the most recent entries; it is compacted back down to
+# MAX_HISTORY_ENTRIES once it grows to twice that many lines
+MAX_HISTORY_ENTRIES = 1000
+
+# Regexes that can't be spliced into the combined alternation: numbered or
+# named backreferences (and group conditionals) would point at the wrong
+# group, and inline global flags are only legal at the start of an expression.
+_UNFUSABLE_REGEX = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)')
+
+# Error signature hashing; recorded in learnings.json so signatures written
+# with a different algorithm can be recognized. Files without the stamp
+# predate it and hashed with truncated md5.
+SIGNATURE_ALGORITHM = "blake2b-8"
+LEGACY_SIGNATURE_ALGORITHM = "md5-16"
+_SIGNATURE_HASHES: Dict[str, Callable[[bytes], str]] = {
+    "blake2b-8": lambda data: hashlib.blake2b(data, digest_size=8).hexdigest(),
+    "md5-16": lambda data: hashlib.md5(data).hexdigest()[:16],
+}
+
+# Error signature normalization
+_SIG_NUMBER = re.compile(r'\b\d+\b')
+_SIG_ADDRESS = re.compile(r'0x[0-9a-fA-F]+')
+_SIG_PATH = re.compile(r'[\\/][^\\/\s]+[\\/]')
+
+# identify_error remembers results for this many recent (text, type) pairs;
+# real workloads repeat the same few errors
+IDENTIFY_CACHE_SIZE = 256
 
 # Retry defaults
 DEFAULT_MAX_RETRIES = 3
@@ -46,6 +95,53 @@ DEFAULT_INITIAL_DELAY = 1.0  # seconds
 DEFAULT_MAX_DELAY = 60.0     # seconds
 DEFAULT_BACKOFF_FACTOR = 2.0
 
+# Persistence batching: pending writes go to disk once this many seconds
+# have passed since the last flush, or once FLUSH_BATCH_SIZE are queued
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+FLUSH_BATCH_SIZE = 100
+
+
+# __slots__ saves the per-instance __dict__ and speeds up attribute access;
+# dataclass(slots=True) needs Python 3.10+
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+# ============== HELPERS ==============
+def _dumps(obj: Any, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: int etc. keys become strings, as json.dumps does
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# keep catching the stdlib exception
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+@functools.lru_cache(maxsize=512)
+def _compiled_regex(regex: str) -> re.Pattern:
+    """
+    Compile a pattern regex (case-insensitive), shared across instances.
+    
+    Every ErrorRecovery rebuilds the same built-in and saved patterns, so
+    each distinct regex is compiled once per process. Raises re.error.
+    """
+    return re.compile(regex, re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def _error_signature(error_text: str, algorithm: str = SIGNATURE_ALGORITHM) -> str:
+    """Generate a signature for an error for deduplication."""
+    # Normalize error text
+    normalized = _SIG_NUMBER.sub('N', error_text)  # Replace numbers
+    normalized = _SIG_ADDRESS.sub('ADDR', normalized)  # Replace addresses
+    normalized = _SIG_PATH.sub('/', normalized)  # Normalize paths
+    normalized = normalized.lower().strip()
+    return _SIGNATURE_HASHES[algorithm](normalized.encode())
+
 
 class RecoveryStrategy(Enum):
     """Available recovery strategies."""
@@ -65,7 +161,11 @@ class Severity(Enum):
     CRITICAL = "critical" # Requires immediate escalation
 
 
-@dataclass
+# Severity value -> rank (low=0 .. critical=3), for sorting most severe first
+_SEV_ORDER = {severity.value: rank for rank, severity in enumerate(Severity)}
+
+
+@dataclass(**_SLOTS)
 class ErrorPattern:
     """Represents a known error pattern."""
     pattern_id: str
@@ -80,32 +180,61 @@ class ErrorPattern:
     created: str = field(default_factory=lambda: datetime.now().isoformat())
     match_count: int = 0
     success_count: int = 0
+    # Match caches filled in by __post_init__; never serialized
+    _compiled: Optional[re.Pattern] = field(default=None, init=False, repr=False, compare=False)
+    _mc_lower: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _error_types_set: FrozenSet[str] = field(
+        default=frozenset(), init=False, repr=False, compare=False
+    )
 
-    def matches(self, error_text: str, error_type: Optional[str] = None) -> bool:
-        """Check if this pattern matches the given error."""
-        # Check regex pattern
+    def __post_init__(self):
+        """Compile the regex and casefold phrases once, not on every match."""
+        self.pattern_id = sys.intern(self.pattern_id)  # Shared with history entries
         if self.regex:
             try:
-                if re.search(self.regex, error_text, re.IGNORECASE):
-                    return True
+                self._compiled = _compiled_regex(self.regex)
             except re.error:
-                pass
+                pass  # Invalid regex never matches
+        self._mc_lower = [p.casefold() for p in (self.message_contains or [])]
+        self._error_types_set = frozenset(self.error_types or ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable fields of this pattern (excludes the match caches)."""
+        return {name: getattr(self, name) for name in _PATTERN_FIELDS}
+
+    def matches(
+        self,
+        error_text: str,
+        error_type: Optional[str] = None,
+        error_text_lower: Optional[str] = None
+    ) -> bool:
+        """
+        Check if this pattern matches the given error.
+        
+        Args:
+            error_text: Error text to match against
+            error_type: Exception class name, if known
+            error_text_lower: error_text.casefold(), if the caller already has it
+        """
+        # Check regex pattern
+        if self._compiled is not None and self._compiled.search(error_text):
+            return True
         
+        if error_text_lower is None:
+            error_text_lower = error_text.casefold()
+        return self._matches_phrase_or_type(error_text_lower, error_type)
+
+    def _matches_phrase_or_type(self, error_text_lower: str, error_type: Optional[str]) -> bool:
+        """Check the message_contains and error_types criteria (everything but the regex)."""
         # Check message contains
-        if self.message_contains:
-            for phrase in self.message_contains:
-                if phrase.lower() in error_text.lower():
-                    return True
+        if any(phrase in error_text_lower for phrase in self._mc_lower):
+            return True
         
         # Check error type
-        if self.error_types and error_type:
-            if error_type in self.error_types:
-                return True
-        
-        return False
+        return error_type in self._error_types_set
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RecoveryAttempt:
     """Records a recovery attempt."""
     attempt_id: str
@@ -119,10 +248,32 @@ class RecoveryAttempt:
     modifications: Optional[Dict[str, Any]] = None
     fallback_used: Optional[str] = None
     notes: Optional[str] = None
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: str = ""  # ISO time; filled in by __post_init__ for new attempts
+    ts_epoch: Optional[float] = None  # timestamp as epoch seconds, for date filters
+
+    def __post_init__(self):
+        """Intern repeated ids and fill in whichever timestamp form is missing."""
+        # Loaded history repeats a handful of strategy and pattern ids
+        # thousands of times; share one string per id
+        self.strategy_used = sys.intern(self.strategy_used)
+        if self.pattern_id is not None:
+            self.pattern_id = sys.intern(self.pattern_id)
+        # New attempts read the clock once and format it; only entries saved
+        # before ts_epoch existed need their ISO string parsed
+        if self.ts_epoch is None:
+            self.ts_epoch = (
+                datetime.fromisoformat(self.timestamp).timestamp() if self.timestamp
+                else time.time()
+            )
+        if not self.timestamp:
+            self.timestamp = datetime.fromtimestamp(self.ts_epoch).isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable fields of this attempt."""
+        return {name: getattr(self, name) for name in _ATTEMPT_FIELDS}
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Learning:
     """Records what worked for specific error patterns."""
     learning_id: str
@@ -135,6 +286,323 @@ class Learning:
     last_success: str
     notes: Optional[str] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable fields of this learning."""
+        return {name: getattr(self, name) for name in _LEARNING_FIELDS}
+
+
+# Field names for to_dict(), computed once. Unlike asdict() this is a
+# shallow copy: no recursion or deepcopy of the list/dict values.
+_PATTERN_FIELDS = tuple(f.name for f in fields(ErrorPattern) if not f.name.startswith('_'))
+_ATTEMPT_FIELDS = tuple(f.name for f in fields(RecoveryAttempt) if not f.name.startswith('_'))
+_LEARNING_FIELDS = tuple(f.name for f in fields(Learning))
+
+# '{"attempt_id":', ',"pattern_id":', ... precomputed for _encode_attempt
+_ATTEMPT_KEY_PREFIXES = tuple(
+    ('{' if i == 0 else ',') + json.dumps(name) + ':'
+    for i, name in enumerate(_ATTEMPT_FIELDS)
+)
+
+
+def _encode_json_value(value: Any) -> str:
+    """Encode one JSON value, skipping the generic encoder for scalars."""
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    value_type = type(value)
+    if value_type is str:
+        return _encode_json_str(value)
+    if value_type is int:
+        return int.__repr__(value)
+    if value_type is float and value - value == 0:  # finite
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+def _encode_attempt(attempt: RecoveryAttempt) -> bytes:
+    """Encode an attempt as one compact JSON line (without the newline)."""
+    if orjson is not None:
+        # Serializes dataclasses natively; non-str modifications keys are
+        # stringified like the json fallback does
+        return orjson.dumps(attempt, option=orjson.OPT_NON_STR_KEYS)
+    # Fixed schema: only the values need encoding, the keys are constants
+    return (
+        "".join([
+            prefix + _encode_json_value(getattr(attempt, name))
+            for prefix, name in zip(_ATTEMPT_KEY_PREFIXES, _ATTEMPT_FIELDS)
+        ]) + "}"
+    ).encode('utf-8')
+
+
+def _encode_history_lines(attempts: Any) -> bytes:
+    """
+    Encode attempts as JSON Lines. An attempt that can't be encoded (say,
+    an unserializable modifications value) is dropped with a warning, so it
+    can't block every later write.
+    """
+    lines = []
+    for attempt in attempts:
+        try:
+            lines.append(_encode_attempt(attempt) + b"\n")
+        except (TypeError, ValueError) as e:
+            print(f"[!] Warning: Dropped unencodable history entry {attempt.attempt_id}: {e}")
+    return b"".join(lines)
+
+
+# Built-in patterns, instantiated only for IDs not already loaded from disk
+_BUILTIN_PATTERN_SPECS: Tuple[Dict[str, Any], ...] = (
+    dict(
+        pattern_id="connection_refused",
+        name="Connection Refused",
+        regex=r"connection\s*refused|ECONNREFUSED|WinError 10061",
+        message_contains=["connection refused", "Connection refused"],
+        error_types=["ConnectionRefusedError", "OSError"],
+        severity="medium",
+        default_strategy="retry",
+        description="Server or service is not accepting connections",
+        recovery_hints=[
+            "Check if server is running",
+            "Verify port number is correct",
+            "Check firewall rules"
+        ]
+    ),
+    dict(
+        pattern_id="timeout",
+        name="Operation Timeout",
+        regex=r"timed?\s*out|TimeoutError|deadline exceeded|ETIMEDOUT",
+        message_contains=["timeout", "timed out"],
+        error_types=["TimeoutError", "asyncio.TimeoutError"],
+        severity="medium",
+        default_strategy="retry_modified",
+        description="Operation took too long to complete",
+        recovery_hints=[
+            "Increase timeout value",
+            "Check network connectivity",
+            "Reduce operation scope"
+        ]
+    ),
+    dict(
+        pattern_id="file_not_found",
+        name="File Not Found",
+        regex=r"file\s*not\s*found|No such file|ENOENT|FileNotFoundError",
+        message_contains=["file not found", "no such file"],
+        error_types=["FileNotFoundError"],
+        severity="medium",
+        default_strategy="fallback",
+        description="Requested file does not exist",
+        recovery_hints=[
+            "Check file path is correct",
+            "Verify file hasn't been moved/deleted",
+            "Create file if appropriate"
+        ]
+    ),
+    dict(
+        pattern_id="permission_denied",
+        name="Permission Denied",
+        regex=r"permission\s*denied|access\s*denied|EACCES|PermissionError",
+        message_contains=["permission denied", "access denied"],
+        error_types=["PermissionError"],
+        severity="high",
+        default_strategy="escalate",
+        description="Insufficient permissions for operation",
+        recovery_hints=[
+            "Check file/directory permissions",
+            "Run with elevated privileges if appropriate",
+            "Contact administrator"
+        ]
+    ),
+    dict(
+        pattern_id="memory_error",
+        name="Memory Error",
+        regex=r"out\s*of\s*memory|MemoryError|memory allocation|heap",
+        message_contains=["memory", "heap"],
+        error_types=["MemoryError"],
+        severity="high",
+        default_strategy="retry_modified",
+        description="Insufficient memory for operation",
+        recovery_hints=[
+            "Process data in smaller chunks",
+            "Free up memory before retry",
+            "Increase available memory"
+        ]
+    ),
+    dict(
+        pattern_id="rate_limit",
+        name="Rate Limited",
+        regex=r"rate\s*limit|too\s*many\s*requests|429|throttl",
+        message_contains=["rate limit", "too many requests", "throttled"],
+        severity="low",
+        default_strategy="retry",
+        description="API rate limit exceeded",
+        recovery_hints=[
+            "Wait before retrying",
+            "Implement exponential backoff",
+            "Reduce request frequency"
+        ]
+    ),
+    dict(
+        pattern_id="json_decode",
+        name="JSON Decode Error",
+        regex=r"JSONDecodeError|json\.decoder|Expecting value|Invalid JSON",
+        message_contains=["json", "decode", "parse error"],
+        error_types=["json.JSONDecodeError", "JSONDecodeError"],
+        severity="medium",
+        default_strategy="skip",
+        description="Failed to parse JSON data",
+        recovery_hints=[
+            "Validate JSON syntax",
+            "Check for encoding issues",
+            "Handle empty responses"
+        ]
+    ),
+    dict(
+        pattern_id="network_unreachable",
+        name="Network Unreachable",
+        regex=r"network\s*(is\s*)?unreachable|ENETUNREACH|no route|DNS",
+        message_contains=["network unreachable", "no route"],
+        error_types=["OSError"],
+        severity="high",
+        default_strategy="retry",
+        description="Network connectivity issue",
+        recovery_hints=[
+            "Check network connection",
+            "Verify DNS resolution",
+            "Check VPN/proxy settings"
+        ]
+    ),
+    dict(
+        pattern_id="disk_full",
+        name="Disk Full",
+        regex=r"disk\s*full|no\s*space|ENOSPC|disk quota",
+        message_contains=["disk full", "no space left", "quota"],
+        severity="critical",
+        default_strategy="escalate",
+        description="Insufficient disk space",
+        recovery_hints=[
+            "Free up disk space",
+            "Clean temporary files",
+            "Extend storage"
+        ]
+    ),
+    dict(
+        pattern_id="auth_error",
+        name="Authentication Error",
+        regex=r"auth.*fail|401|unauthorized|invalid\s*(token|credential|api\s*key)",
+        message_contains=["authentication", "unauthorized", "invalid token"],
+        severity="high",
+        default_strategy="escalate",
+        description="Authentication or authorization failure",
+        recovery_hints=[
+            "Verify credentials",
+            "Refresh authentication token",
+            "Check API key validity"
+        ]
+    ),
+    dict(
+        pattern_id="import_error",
+        name="Import Error",
+        regex=r"ImportError|ModuleNotFoundError|No module named",
+        message_contains=["import error", "no module named"],
+        error_types=["ImportError", "ModuleNotFoundError"],
+        severity="high",
+        default_strategy="fallback",
+        description="Failed to import required module",
+        recovery_hints=[
+            "Install missing package",
+            "Check Python path",
+            "Verify package name"
+        ]
+    ),
+    dict(
+        pattern_id="syntax_error",
+        name="Syntax Error",
+        regex=r"SyntaxError|invalid syntax|unexpected (token|EOF)",
+        error_types=["SyntaxError"],
+        severity="high",
+        default_strategy="abort",
+        description="Invalid Python syntax",
+        recovery_hints=[
+            "Check code for typos",
+            "Verify parentheses/brackets match",
+            "Review recent changes"
+        ]
+    ),
+)
+
+
+class _TrackedDict(dict):
+    """
+    Dict that flags its own changes (dirty), so an index built from it is
+    rebuilt after any edit, including direct ones like
+    recovery.patterns[pattern_id] = pattern or del recovery.learnings[learning_id].
+    """
+    __slots__ = ('dirty',)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = True
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dirty = True
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.dirty = True
+    
+    def __ior__(self, other):
+        self.update(other)
+        return self
+    
+    def pop(self, *args):
+        self.dirty = True
+        return super().pop(*args)
+    
+    def popitem(self):
+        self.dirty = True
+        return super().popitem()
+    
+    def clear(self):
+        super().clear()
+        self.dirty = True
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.dirty = True
+    
+    def setdefault(self, key, default=None):
+        self.dirty = True
+        return super().setdefault(key, default)
+
+
+def _coarse_error_types(specs: Tuple[Dict[str, Any], ...]) -> FrozenSet[str]:
+    """
+    Built-in exception names listed by one spec that are also a base class
+    of an exception another spec lists (OSError, a base of
+    ConnectionRefusedError, FileNotFoundError and the rest). Too broad for
+    the subclass fallback in _match_pattern: every unrelated OSError would
+    resolve to whichever pattern lists it first.
+    """
+    listed = [
+        (getattr(builtins, name), spec['pattern_id'])
+        for spec in specs
+        for name in spec.get('error_types') or ()
+        if isinstance(getattr(builtins, name, None), type)
+    ]
+    return frozenset(
+        cls.__name__ for cls, pattern_id in listed
+        if any(
+            other is not cls and issubclass(other, cls) and other_id != pattern_id
+            for other, other_id in listed
+        )
+    )
+
+
+_COARSE_ERROR_TYPES = _coarse_error_types(_BUILTIN_PATTERN_SPECS)
+
 
 class ErrorRecovery:
     """
@@ -158,7 +626,9 @@ class ErrorRecovery:
         initial_delay: float = DEFAULT_INITIAL_DELAY,
         max_delay: float = DEFAULT_MAX_DELAY,
         backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
-        auto_learn: bool = True
+        auto_learn: bool = True,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        jitter: bool = False
     ):
         """
         Initialize ErrorRecovery system.
@@ -170,6 +640,10 @@ class ErrorRecovery:
             max_delay: Maximum delay between retries (seconds)
             backoff_factor: Multiplier for exponential backoff
             auto_learn: Whether to automatically learn from recoveries
+            flush_interval: Seconds between batched writes of history and
+                learnings (0 writes immediately); see flush()
+            jitter: Randomize each retry delay between 0 and the backoff
+                delay ("full jitter") so concurrent workers don't retry in lockstep
         """
         self.data_dir = Path(data_dir) if data_dir else DEFAULT_DATA_DIR
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -179,210 +653,232 @@ class ErrorRecovery:
         self.max_delay = max_delay
         self.backoff_factor = backoff_factor
         self.auto_learn = auto_learn
+        self.flush_interval = flush_interval
+        self.jitter = jitter
+        
+        # Pending writes (see _mark_dirty/flush)
+        self._dirty = {'patterns': False, 'learnings': False, 'history': False}
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        # A timer flushes a pending batch at most flush_interval seconds
+        # later, so an idle instance doesn't hold writes in memory; the lock
+        # keeps that background flush off stores being changed
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.RLock()
         
-        # Load data
-        self.patterns: Dict[str, ErrorPattern] = {}
-        self.learnings: Dict[str, Learning] = {}
-        self.history: List[RecoveryAttempt] = []
+        # Patterns and learnings are loaded on first access (see the
+        # patterns and learnings properties)
+        self._patterns: Optional[_TrackedDict] = None
+        self._learnings: Optional[_TrackedDict] = None
+        self._learnings_by_sig: Dict[str, List[Learning]] = {}
+        self._signature_algorithm = SIGNATURE_ALGORITHM  # As stamped in learnings.json
         
-        self._load_patterns()
-        self._load_learnings()
-        self._load_history()
+        # History is loaded on first access (see the history property)
+        self._history: Optional[Deque[RecoveryAttempt]] = None
+        # Appended before load; bounded like history itself, which would
+        # evict the older ones anyway
+        self._unsaved_history: Deque[RecoveryAttempt] = deque(maxlen=MAX_HISTORY_ENTRIES)
+        self._pending_history: List[RecoveryAttempt] = []  # Not yet on disk
+        self._history_lines: Optional[int] = None  # Lines in history.jsonl
+        # Bumped on every history change; keys the cached history totals
+        self._history_version = 0
+        self._history_totals: Tuple[int, Dict[str, Dict[str, int]]] = (-1, {})
         
-        # Initialize with built-in patterns
-        self._init_builtin_patterns()
+        # Matching index, rebuilt lazily when patterns change (see _rebuild_index)
+        self._pattern_order: List[ErrorPattern] = []
+        self._fused: List[bool] = []
+        self._error_type_rank: Dict[str, int] = {}
+        self._combined: Optional[re.Pattern] = None
+        self._regex_ranks: List[int] = []  # Ranks of patterns with a usable regex
+        self._unfused_regex_ranks: List[int] = []  # ... of those, kept out of _combined
+        self._hs_db = None  # hyperscan.Database when hyperscan is installed
+        self._phrase_automaton = None  # ahocorasick.Automaton when pyahocorasick is installed
+        self._phrase_gate: Optional[re.Pattern] = None  # Any message_contains phrase
+        self._empty_phrase_rank: Optional[int] = None
+        self._identify_cache: 'OrderedDict[Tuple[str, Optional[type]], Optional[ErrorPattern]]' = OrderedDict()
+        
+        self._migrate_legacy_history()
+    
+    @property
+    def patterns(self) -> Dict[str, ErrorPattern]:
+        """Error patterns by ID: saved ones first, then the built-ins, loaded on first access."""
+        if self._patterns is None:
+            with self._flush_lock:  # A timer flush mustn't see a half-loaded dict
+                if self._patterns is None:
+                    self._patterns = _TrackedDict()
+                    self._load_patterns()
+                    self._init_builtin_patterns()
+        return self._patterns
+    
+    @patterns.setter
+    def patterns(self, value: Dict[str, ErrorPattern]):
+        # Stored as a copy that tracks its own edits (see _TrackedDict)
+        self._patterns = _TrackedDict(value)
+    
+    @property
+    def _patterns_dirty(self) -> bool:
+        """Whether patterns changed since the matching index was built."""
+        return self._patterns is None or self._patterns.dirty
+    
+    @property
+    def learnings(self) -> Dict[str, Learning]:
+        """Learnings by ID, loaded from disk the first time they are read."""
+        if self._learnings is None:
+            with self._flush_lock:  # A timer flush mustn't see a half-loaded dict
+                if self._learnings is None:
+                    self._learnings = _TrackedDict()
+                    self._load_learnings()
+        return self._learnings
+    
+    @learnings.setter
+    def learnings(self, value: Dict[str, Learning]):
+        # Stored as a copy that tracks its own edits (see _TrackedDict)
+        self._learnings = _TrackedDict(value)
     
     def _init_builtin_patterns(self):
         """Initialize built-in error patterns."""
-        builtin = [
-            ErrorPattern(
-                pattern_id="connection_refused",
-                name="Connection Refused",
-                regex=r"connection\s*refused|ECONNREFUSED|WinError 10061",
-                message_contains=["connection refused", "Connection refused"],
-                error_types=["ConnectionRefusedError", "OSError"],
-                severity="medium",
-                default_strategy="retry",
-                description="Server or service is not accepting connections",
-                recovery_hints=[
-                    "Check if server is running",
-                    "Verify port number is correct",
-                    "Check firewall rules"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="timeout",
-                name="Operation Timeout",
-                regex=r"timed?\s*out|TimeoutError|deadline exceeded|ETIMEDOUT",
-                message_contains=["timeout", "timed out"],
-                error_types=["TimeoutError", "asyncio.TimeoutError"],
-                severity="medium",
-                default_strategy="retry_modified",
-                description="Operation took too long to complete",
-                recovery_hints=[
-                    "Increase timeout value",
-                    "Check network connectivity",
-                    "Reduce operation scope"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="file_not_found",
-                name="File Not Found",
-                regex=r"file\s*not\s*found|No such file|ENOENT|FileNotFoundError",
-                message_contains=["file not found", "no such file"],
-                error_types=["FileNotFoundError"],
-                severity="medium",
-                default_strategy="fallback",
-                description="Requested file does not exist",
-                recovery_hints=[
-                    "Check file path is correct",
-                    "Verify file hasn't been moved/deleted",
-                    "Create file if appropriate"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="permission_denied",
-                name="Permission Denied",
-                regex=r"permission\s*denied|access\s*denied|EACCES|PermissionError",
-                message_contains=["permission denied", "access denied"],
-                error_types=["PermissionError"],
-                severity="high",
-                default_strategy="escalate",
-                description="Insufficient permissions for operation",
-                recovery_hints=[
-                    "Check file/directory permissions",
-                    "Run with elevated privileges if appropriate",
-                    "Contact administrator"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="memory_error",
-                name="Memory Error",
-                regex=r"out\s*of\s*memory|MemoryError|memory allocation|heap",
-                message_contains=["memory", "heap"],
-                error_types=["MemoryError"],
-                severity="high",
-                default_strategy="retry_modified",
-                description="Insufficient memory for operation",
-                recovery_hints=[
-                    "Process data in smaller chunks",
-                    "Free up memory before retry",
-                    "Increase available memory"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="rate_limit",
-                name="Rate Limited",
-                regex=r"rate\s*limit|too\s*many\s*requests|429|throttl",
-                message_contains=["rate limit", "too many requests", "throttled"],
-                severity="low",
-                default_strategy="retry",
-                description="API rate limit exceeded",
-                recovery_hints=[
-                    "Wait before retrying",
-                    "Implement exponential backoff",
-                    "Reduce request frequency"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="json_decode",
-                name="JSON Decode Error",
-                regex=r"JSONDecodeError|json\.decoder|Expecting value|Invalid JSON",
-                message_contains=["json", "decode", "parse error"],
-                error_types=["json.JSONDecodeError", "JSONDecodeError"],
-                severity="medium",
-                default_strategy="skip",
-                description="Failed to parse JSON data",
-                recovery_hints=[
-                    "Validate JSON syntax",
-                    "Check for encoding issues",
-                    "Handle empty responses"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="network_unreachable",
-                name="Network Unreachable",
-                regex=r"network\s*(is\s*)?unreachable|ENETUNREACH|no route|DNS",
-                message_contains=["network unreachable", "no route"],
-                error_types=["OSError"],
-                severity="high",
-                default_strategy="retry",
-                description="Network connectivity issue",
-                recovery_hints=[
-                    "Check network connection",
-                    "Verify DNS resolution",
-                    "Check VPN/proxy settings"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="disk_full",
-                name="Disk Full",
-                regex=r"disk\s*full|no\s*space|ENOSPC|disk quota",
-                message_contains=["disk full", "no space left", "quota"],
-                severity="critical",
-                default_strategy="escalate",
-                description="Insufficient disk space",
-                recovery_hints=[
-                    "Free up disk space",
-                    "Clean temporary files",
-                    "Extend storage"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="auth_error",
-                name="Authentication Error",
-                regex=r"auth.*fail|401|unauthorized|invalid\s*(token|credential|api\s*key)",
-                message_contains=["authentication", "unauthorized", "invalid token"],
-                severity="high",
-                default_strategy="escalate",
-                description="Authentication or authorization failure",
-                recovery_hints=[
-                    "Verify credentials",
-                    "Refresh authentication token",
-                    "Check API key validity"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="import_error",
-                name="Import Error",
-                regex=r"ImportError|ModuleNotFoundError|No module named",
-                message_contains=["import error", "no module named"],
-                error_types=["ImportError", "ModuleNotFoundError"],
-                severity="high",
-                default_strategy="fallback",
-                description="Failed to import required module",
-                recovery_hints=[
-                    "Install missing package",
-                    "Check Python path",
-                    "Verify package name"
-                ]
-            ),
-            ErrorPattern(
-                pattern_id="syntax_error",
-                name="Syntax Error",
-                regex=r"SyntaxError|invalid syntax|unexpected (token|EOF)",
-                error_types=["SyntaxError"],
-                severity="high",
-                default_strategy="abort",
-                description="Invalid Python syntax",
-                recovery_hints=[
-                    "Check code for typos",
-                    "Verify parentheses/brackets match",
-                    "Review recent changes"
-                ]
-            ),
+        for spec in _BUILTIN_PATTERN_SPECS:
+            if spec['pattern_id'] not in self.patterns:
+                # Copy the lists so instances never share them with the spec
+                self.patterns[spec['pattern_id']] = ErrorPattern(**{
+                    k: list(v) if isinstance(v, list) else v
+                    for k, v in spec.items()
+                })
+    
+    def _rebuild_index(self):
+        """
+        Rebuild the matching index; identify_error calls this on first use
+        after patterns change, so adding many patterns compiles it once.
+        
+        Every usable regex is fused into one alternation with a named group
+        per pattern, so identify_error runs a single regex search instead of
+        one per pattern. Exception type names map to the first pattern that
+        lists them.
+        
+        With hyperscan installed, the fused regexes are also compiled into a
+        hyperscan database in prefilter mode; see _hyperscan_candidates.
+        With pyahocorasick installed, every message_contains phrase goes into
+        one Aho-Corasick automaton; see _first_phrase_rank. Without it, the
+        phrases are fused into one literal alternation that only answers
+        whether any phrase occurs at all, so most non-matching errors skip
+        the per-pattern phrase checks.
+        """
+        self._identify_cache.clear()
+        self._pattern_order = list(self.patterns.values())
+        self._fused = []
+        self._error_type_rank = {}
+        alternatives = []
+        hs_ranks = []
+        for rank, pattern in enumerate(self._pattern_order):
+            for error_type in pattern._error_types_set:
+                self._error_type_rank.setdefault(error_type, rank)
+            fusable = (
+                pattern._compiled is not None
+                and not pattern._compiled.groupindex
+                and not _UNFUSABLE_REGEX.search(pattern.regex)
+            )
+            self._fused.append(fusable)
+            if fusable:
+                alternatives.append(f"(?P<_p{rank}>{pattern.regex})")
+                hs_ranks.append(rank)
+        
+        self._combined = None
+        if alternatives:
+            try:
+                self._combined = _compiled_regex("|".join(alternatives))
+            except re.error:
+                self._fused = [False] * len(self._pattern_order)
+                hs_ranks = []
+        
+        self._regex_ranks = [
+            rank for rank, pattern in enumerate(self._pattern_order) if pattern._compiled is not None
         ]
+        self._unfused_regex_ranks = [rank for rank in self._regex_ranks if not self._fused[rank]]
         
-        for pattern in builtin:
-            if pattern.pattern_id not in self.patterns:
-                self.patterns[pattern.pattern_id] = pattern
+        self._hs_db = None
+        if hyperscan is not None and hs_ranks:
+            flags = (
+                hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+                | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_ALLOWEMPTY
+                | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+            )
+            try:
+                db = hyperscan.Database()
+                db.compile(
+                    expressions=[self._pattern_order[r].regex.encode('utf-8') for r in hs_ranks],
+                    ids=hs_ranks,
+                    elements=len(hs_ranks),
+                    flags=[flags] * len(hs_ranks)
+                )
+                self._hs_db = db
+            except hyperscan.error:
+                pass  # Syntax hyperscan can't handle; the combined regex is used
+        
+        self._phrase_automaton = None
+        self._empty_phrase_rank = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for rank, pattern in enumerate(self._pattern_order):
+                for phrase in pattern._mc_lower:
+                    if not phrase:
+                        # "" is in every string but can't be an automaton key
+                        if self._empty_phrase_rank is None:
+                            self._empty_phrase_rank = rank
+                    elif phrase not in automaton:
+                        automaton.add_word(phrase, rank)  # Ranks ascend: keeps the first
+            if len(automaton):
+                automaton.make_automaton()
+            self._phrase_automaton = automaton
+        
+        self._phrase_gate = None
+        phrases = {p for pattern in self._pattern_order for p in pattern._mc_lower}
+        if self._phrase_automaton is None and phrases:
+            # A false hit only costs the exact per-pattern checks, so the
+            # shared case-insensitive compile cache is fine here
+            self._phrase_gate = _compiled_regex("|".join(re.escape(p) for p in sorted(phrases)))
+        self.patterns.dirty = False
+    
+    def _hyperscan_candidates(self, error_text: str) -> Optional[set]:
+        """
+        Ranks of fused patterns whose regex may match, from one hyperscan scan.
+        
+        Prefilter mode reports a superset of real matches (hyperscan's
+        semantics differ slightly from Python's re), so every candidate is
+        still confirmed with the pattern's own compiled regex. Returns None
+        for text hyperscan can't scan (not encodable as UTF-8, e.g. lone
+        surrogates from surrogateescape decoding).
+        """
+        try:
+            data = error_text.encode('utf-8')
+        except UnicodeEncodeError:
+            return None
+        ranks = set()
+        
+        def on_match(rank, start, end, flags, context):
+            ranks.add(rank)
+        
+        self._hs_db.scan(data, match_event_handler=on_match)
+        return ranks
+    
+    def _first_phrase_rank(self, error_text_lower: str) -> Optional[int]:
+        """
+        Rank of the first pattern with a message_contains phrase in the text,
+        from one pass of the Aho-Corasick automaton (None if no phrase occurs).
+        """
+        automaton = self._phrase_automaton
+        first = self._empty_phrase_rank
+        if len(automaton):
+            for _, rank in automaton.iter(error_text_lower):
+                if first is None or rank < first:
+                    first = rank
+        return first
     
     def _load_patterns(self):
         """Load patterns from file."""
         patterns_file = self.data_dir / "patterns.json"
         if patterns_file.exists():
             try:
-                data = json.loads(patterns_file.read_text(encoding='utf-8'))
+                data = _loads(patterns_file.read_bytes())
                 for p_data in data.get('patterns', []):
                     pattern = ErrorPattern(**p_data)
                     self.patterns[pattern.pattern_id] = pattern
@@ -395,21 +891,40 @@ class ErrorRecovery:
         data = {
             'version': VERSION,
             'updated': datetime.now().isoformat(),
-            'patterns': [asdict(p) for p in self.patterns.values()]
+            'patterns': [p.to_dict() for p in self.patterns.values()]
         }
-        patterns_file.write_text(json.dumps(data, indent=2), encoding='utf-8')
+        patterns_file.write_bytes(_dumps(data))
     
     def _load_learnings(self):
         """Load learnings from file."""
         learnings_file = self.data_dir / "learnings.json"
         if learnings_file.exists():
             try:
-                data = json.loads(learnings_file.read_text(encoding='utf-8'))
+                data = _loads(learnings_file.read_bytes())
                 for l_data in data.get('learnings', []):
                     learning = Learning(**l_data)
                     self.learnings[learning.learning_id] = learning
+                # Stored hashes can't be recomputed (the error text isn't
+                # kept), so this data dir goes on signing errors with the
+                # algorithm its learnings were written with
+                algorithm = data.get('signature_algorithm')
+                if algorithm is None and self._learnings:
+                    algorithm = LEGACY_SIGNATURE_ALGORITHM
+                if algorithm in _SIGNATURE_HASHES:
+                    self._signature_algorithm = algorithm
+                elif algorithm is not None:
+                    print(f"[!] Warning: Unknown signature algorithm {algorithm!r}; "
+                          f"learned signatures won't match")
             except (json.JSONDecodeError, TypeError) as e:
                 print(f"[!] Warning: Could not load learnings: {e}")
+        self._rebuild_learning_index()
+    
+    def _rebuild_learning_index(self):
+        """Rebuild the error_signature -> learnings lookup."""
+        self._learnings_by_sig = {}
+        for learning in self.learnings.values():
+            self._learnings_by_sig.setdefault(learning.error_signature, []).append(learning)
+        self.learnings.dirty = False
     
     def _save_learnings(self):
         """Save learnings to file."""
@@ -417,42 +932,178 @@ class ErrorRecovery:
         data = {
             'version': VERSION,
             'updated': datetime.now().isoformat(),
-            'learnings': [asdict(l) for l in self.learnings.values()]
+            'signature_algorithm': self._signature_algorithm,
+            'learnings': [l.to_dict() for l in self.learnings.values()]
         }
-        learnings_file.write_text(json.dumps(data, indent=2), encoding='utf-8')
+        learnings_file.write_bytes(_dumps(data))
+    
+    @property
+    def history(self) -> Deque[RecoveryAttempt]:
+        """
+        Recovery history, loaded from disk the first time it is read.
+        
+        Bounded to the most recent MAX_HISTORY_ENTRIES; older entries are
+        evicted as new ones are appended.
+        """
+        if self._history is None:
+            # Held for the whole load: a timer flush in between would write
+            # the pending attempts after the file was read but before they
+            # were merged in, dropping them from memory
+            with self._flush_lock:
+                if self._history is None:
+                    self._load_history()
+        return self._history
+    
+    @history.setter
+    def history(self, value):
+        self._history = deque(value, maxlen=MAX_HISTORY_ENTRIES)
+        self._unsaved_history.clear()
+        self._pending_history = []
+        self._history_version += 1
     
     def _load_history(self):
-        """Load recovery history from file."""
-        history_file = self.data_dir / "history.json"
+        """Load recovery history from file (one JSON object per line)."""
+        self._history = deque(maxlen=MAX_HISTORY_ENTRIES)
+        history_file = self.data_dir / "history.jsonl"
         if history_file.exists():
-            try:
-                data = json.loads(history_file.read_text(encoding='utf-8'))
-                for h_data in data.get('history', []):
-                    attempt = RecoveryAttempt(**h_data)
-                    self.history.append(attempt)
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"[!] Warning: Could not load history: {e}")
+            # One read for the whole file, then split in memory
+            lines = history_file.read_bytes().splitlines()
+            self._history_lines = len(lines)
+            # Each line stands alone: a bad one (typically the torn last line
+            # of a crashed append) is skipped without losing the rest
+            skipped = 0
+            last_error = None
+            # Older lines would be evicted anyway; don't parse them
+            for line in lines[-MAX_HISTORY_ENTRIES:]:
+                if line.strip():
+                    try:
+                        self._history.append(RecoveryAttempt(**_loads(line)))
+                    except (json.JSONDecodeError, TypeError, ValueError) as e:  # ValueError: bad timestamp
+                        skipped += 1
+                        last_error = e
+            if skipped:
+                print(f"[!] Warning: Skipped {skipped} unreadable history line(s): {last_error}")
+        self._history.extend(self._pending_history)
+        self._history.extend(self._unsaved_history)
+        self._unsaved_history.clear()
     
-    def _save_history(self):
-        """Save recovery history to file."""
-        history_file = self.data_dir / "history.json"
-        # Keep only last 1000 entries
-        recent_history = self.history[-1000:]
-        data = {
-            'version': VERSION,
-            'updated': datetime.now().isoformat(),
-            'history': [asdict(h) for h in recent_history]
-        }
-        history_file.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    def _migrate_legacy_history(self):
+        """Convert a legacy single-document history.json to history.jsonl."""
+        legacy_file = self.data_dir / "history.json"
+        if not legacy_file.exists() or (self.data_dir / "history.jsonl").exists():
+            return
+        try:
+            data = _loads(legacy_file.read_bytes())
+            self.history = [RecoveryAttempt(**h_data) for h_data in data.get('history', [])]
+            self._compact_history()
+            legacy_file.unlink()
+        except (json.JSONDecodeError, TypeError, ValueError) as e:  # ValueError: bad timestamp
+            print(f"[!] Warning: Could not load history: {e}")
+    
+    def _compact_history(self):
+        """
+        Rewrite the history file with just the in-memory entries.
+        
+        Appends never drop lines, so this runs when the file has grown to
+        twice MAX_HISTORY_ENTRIES and whenever clear_history removes entries.
+        """
+        history_file = self.data_dir / "history.jsonl"
+        history = self.history
+        data = _encode_history_lines(history)
+        history_file.write_bytes(data)
+        self._history_lines = data.count(b"\n")
+        self._pending_history = []
+    
+    def _append_history(self, attempt: RecoveryAttempt):
+        """
+        Record an attempt; it is appended to the history file on the next flush.
+        
+        Existing history is not loaded for this; an attempt that isn't
+        written to disk is kept aside until history is first read.
+        """
+        with self._flush_lock:
+            if self._history is not None:
+                self._history.append(attempt)
+            elif not self.auto_learn:
+                self._unsaved_history.append(attempt)
+            self._history_version += 1
+            if not self.auto_learn:
+                return
+            self._pending_history.append(attempt)
+            self._mark_dirty('history')
+    
+    def _flush_history(self):
+        """Append pending attempts to the history file in a single write."""
+        history_file = self.data_dir / "history.jsonl"
+        if self._history_lines is None:
+            self._history_lines = (
+                history_file.read_bytes().count(b"\n") if history_file.exists() else 0
+            )
+        if self._history_lines >= 2 * MAX_HISTORY_ENTRIES:
+            if self._history is None:
+                self._load_history()  # Picks up the pending attempts too
+            self._compact_history()
+            return
+        with open(history_file, 'a+b') as f:
+            data = _encode_history_lines(self._pending_history)
+            self._history_lines += data.count(b"\n")
+            # A crash mid-append can leave a partial last line; end it first
+            # so the new entries start on a line of their own
+            if f.tell():
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+                    self._history_lines += 1
+            f.write(data)
+        self._pending_history = []
+    
+    def _mark_dirty(self, *stores: str):
+        """Queue a write of the given stores; flush if one is due, else schedule it."""
+        with self._flush_lock:
+            for store in stores:
+                self._dirty[store] = True
+            self._dirty_count += 1
+            _unflushed.add(self)
+            waited = time.monotonic() - self._last_flush
+            if self._dirty_count >= FLUSH_BATCH_SIZE or waited >= self.flush_interval:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(
+                    self.flush_interval - waited, self._flush_pending
+                )
+                self._flush_timer.daemon = True  # Exit doesn't wait; atexit flushes
+                self._flush_timer.start()
+    
+    def flush(self):
+        """Write pending patterns, learnings and history to disk."""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._dirty['patterns']:
+                self._save_patterns()
+            if self._dirty['learnings']:
+                self._save_learnings()
+            if self._dirty['history'] and self._pending_history:
+                self._flush_history()
+            self._dirty = dict.fromkeys(self._dirty, False)
+            self._dirty_count = 0
+            self._last_flush = time.monotonic()
+            _unflushed.discard(self)
+    
+    def _flush_pending(self):
+        """flush() for the timer and exit hook: warns instead of raising."""
+        if not self.data_dir.exists():
+            return  # Data directory was removed; nothing to write into
+        try:
+            self.flush()
+        except (OSError, TypeError, ValueError) as e:  # Encoding errors too
+            print(f"[!] Warning: Could not save recovery data: {e}")
     
     def _error_signature(self, error_text: str) -> str:
-        """Generate a signature for an error for deduplication."""
-        # Normalize error text
-        normalized = re.sub(r'\b\d+\b', 'N', error_text)  # Replace numbers
-        normalized = re.sub(r'0x[0-9a-fA-F]+', 'ADDR', normalized)  # Replace addresses
-        normalized = re.sub(r'[\\/][^\\/\s]+[\\/]', '/', normalized)  # Normalize paths
-        normalized = normalized.lower().strip()
-        return hashlib.md5(normalized.encode()).hexdigest()[:16]
+        """Generate a signature for an error for deduplication (cached)."""
+        self.learnings  # Loading learnings.json settles the signature algorithm
+        return _error_signature(error_text, self._signature_algorithm)
     
     def identify_error(self, error: Union[Exception, str]) -> Tuple[Optional[ErrorPattern], str]:
         """
@@ -465,18 +1116,102 @@ class ErrorRecovery:
             Tuple of (matching pattern or None, error text)
         """
         if isinstance(error, Exception):
-            error_text = f"{type(error).__name__}: {str(error)}"
-            error_type = type(error).__name__
+            error_class = type(error)
+            error_text = f"{error_class.__name__}: {str(error)}"
         else:
             error_text = str(error)
-            error_type = None
+            error_class = None
         
-        # Check all patterns for a match
-        for pattern in self.patterns.values():
-            if pattern.matches(error_text, error_type):
-                return pattern, error_text
+        if self._patterns_dirty:
+            self._rebuild_index()  # Patterns were added, removed or replaced
+        
+        # Recently seen errors skip matching entirely; the cache is emptied
+        # whenever the index is rebuilt
+        key = (error_text, error_class)
+        cache = self._identify_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key], error_text
+        pattern = self._match_pattern(error_text, error_class)
+        cache[key] = pattern
+        if len(cache) > IDENTIFY_CACHE_SIZE:
+            cache.popitem(last=False)
+        return pattern, error_text
+    
+    def _match_pattern(self, error_text: str, error_class: Optional[type]) -> Optional[ErrorPattern]:
+        """First registered pattern matching the text or exception class."""
+        error_type = error_class.__name__ if error_class is not None else None
+        error_text_lower = error_text.casefold()
+        order = self._pattern_order
+        
+        # A combined-regex hit or an indexed exception type is a pattern
+        # known to match, so only the patterns ahead of it still need
+        # checking. Fused patterns outside regex_candidates are known not
+        # to match on their regex and skip it; None means no such knowledge.
+        bound = len(order)
+        regex_candidates: Optional[set] = None
+        if self._hs_db is not None:
+            regex_candidates = self._hyperscan_candidates(error_text)
+        if regex_candidates is None:  # No hyperscan, or text it can't scan
+            hit = self._combined.search(error_text) if self._combined else None
+            if hit:
+                bound = int(hit.lastgroup[2:])
+            else:
+                regex_candidates = set()
+        if error_type is not None:
+            bound = min(bound, self._error_type_rank.get(error_type, bound))
+        
+        if self._phrase_automaton is not None:
+            phrase_rank = self._first_phrase_rank(error_text_lower)
+            if phrase_rank is not None:
+                bound = min(bound, phrase_rank)
+            regex_only = True
+        else:
+            regex_only = self._phrase_gate is None or not self._phrase_gate.search(error_text_lower)
+        
+        if regex_only:
+            # No phrase or exception type matches ahead of the bound, so
+            # only regexes are left: walk just the ranks that have one (and
+            # that the fused scan hasn't ruled out), in rank order
+            if regex_candidates is None:
+                ranks = self._regex_ranks
+            elif regex_candidates:
+                ranks = sorted(regex_candidates.union(self._unfused_regex_ranks))
+            else:
+                ranks = self._unfused_regex_ranks
+            for rank in ranks:
+                if rank >= bound:
+                    break
+                if order[rank]._compiled.search(error_text):
+                    return order[rank]
+        else:
+            for rank in range(bound):
+                pattern = order[rank]
+                if (
+                    regex_candidates is not None
+                    and self._fused[rank]
+                    and rank not in regex_candidates
+                ):
+                    if pattern._matches_phrase_or_type(error_text_lower, error_type):
+                        return pattern
+                elif pattern.matches(error_text, error_type, error_text_lower):
+                    return pattern
         
-        return None, error_text
+        if bound < len(order):
+            return order[bound]
+        
+        if error_type is not None:
+            # Nothing matched outright: fall back to a pattern listing one of
+            # the exception's base classes, nearest base first. Coarse bases
+            # like OSError are skipped, so e.g. FileExistsError stays unmatched
+            # instead of resolving to connection_refused
+            for cls in error_class.__mro__[1:]:
+                if cls.__name__ in _COARSE_ERROR_TYPES:
+                    continue
+                rank = self._error_type_rank.get(cls.__name__)
+                if rank is not None:
+                    return order[rank]
+        return None
     
     def get_recovery_strategy(
         self,
@@ -504,19 +1239,20 @@ class ErrorRecovery:
         }
         
         # Check learnings first
-        for learning in self.learnings.values():
-            if learning.error_signature == error_sig:
-                if learning.success_rate > 0.7:
-                    suggestions['learned'] = True
-                    suggestions['modifications'] = learning.modifications_applied or {}
-                    suggestions['hints'].append(
-                        f"Previously successful strategy: {learning.successful_strategy}"
-                    )
-                    return (
-                        RecoveryStrategy(learning.successful_strategy),
-                        pattern,
-                        suggestions
-                    )
+        if self.learnings.dirty:
+            self._rebuild_learning_index()  # Learnings were added, removed or replaced
+        for learning in self._learnings_by_sig.get(error_sig, ()):
+            if learning.success_rate > 0.7:
+                suggestions['learned'] = True
+                suggestions['modifications'] = learning.modifications_applied or {}
+                suggestions['hints'].append(
+                    f"Previously successful strategy: {learning.successful_strategy}"
+                )
+                return (
+                    RecoveryStrategy(learning.successful_strategy),
+                    pattern,
+                    suggestions
+                )
         
         # Use pattern-based strategy
         if pattern:
@@ -564,7 +1300,7 @@ class ErrorRecovery:
         Returns:
             Tuple of (success, result or exception, recovery attempt record)
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         attempt_id = f"attempt_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
         retries = 0
         last_error: Optional[Exception] = None
@@ -583,7 +1319,7 @@ class ErrorRecovery:
                 result = func(*args, **modified_kwargs)
                 
                 # Success!
-                duration = (time.time() - start_time) * 1000
+                duration = (time.perf_counter() - start_time) * 1000
                 attempt = RecoveryAttempt(
                     attempt_id=attempt_id,
                     pattern_id=None,
@@ -596,9 +1332,7 @@ class ErrorRecovery:
                     modifications=modifications if retries > 0 else None
                 )
                 
-                self.history.append(attempt)
-                if self.auto_learn:
-                    self._save_history()
+                self._append_history(attempt)
                 
                 return True, result, attempt
                 
@@ -617,7 +1351,7 @@ class ErrorRecovery:
                 if strategy == RecoveryStrategy.ABORT:
                     break
                 elif strategy == RecoveryStrategy.SKIP:
-                    duration = (time.time() - start_time) * 1000
+                    duration = (time.perf_counter() - start_time) * 1000
                     attempt = RecoveryAttempt(
                         attempt_id=attempt_id,
                         pattern_id=pattern.pattern_id if pattern else None,
@@ -629,14 +1363,14 @@ class ErrorRecovery:
                         retry_count=retries,
                         notes="Skipped error as per strategy"
                     )
-                    self.history.append(attempt)
+                    self._append_history(attempt)
                     return True, None, attempt
                 elif strategy == RecoveryStrategy.ESCALATE:
                     break  # Exit retry loop, will escalate
                 elif strategy == RecoveryStrategy.FALLBACK and fallback_func:
                     try:
                         result = fallback_func(*args, **kwargs)
-                        duration = (time.time() - start_time) * 1000
+                        duration = (time.perf_counter() - start_time) * 1000
                         attempt = RecoveryAttempt(
                             attempt_id=attempt_id,
                             pattern_id=pattern.pattern_id if pattern else None,
@@ -648,7 +1382,7 @@ class ErrorRecovery:
                             retry_count=retries,
                             fallback_used=fallback_func.__name__
                         )
-                        self.history.append(attempt)
+                        self._append_history(attempt)
                         
                         # Learn from successful fallback
                         if self.auto_learn and pattern:
@@ -666,12 +1400,14 @@ class ErrorRecovery:
                         self.initial_delay * (self.backoff_factor ** (retries - 1)),
                         self.max_delay
                     )
+                    if self.jitter:
+                        delay = random.uniform(0, delay)
                     time.sleep(delay)
                 else:
                     break
         
         # All retries exhausted - failure
-        duration = (time.time() - start_time) * 1000
+        duration = (time.perf_counter() - start_time) * 1000
         pattern, _ = self.identify_error(last_error) if last_error else (None, "")
         
         attempt = RecoveryAttempt(
@@ -686,9 +1422,7 @@ class ErrorRecovery:
             modifications=modifications if modifications else None
         )
         
-        self.history.append(attempt)
-        if self.auto_learn:
-            self._save_history()
+        self._append_history(attempt)
         
         return False, last_error, attempt
     
@@ -699,35 +1433,35 @@ class ErrorRecovery:
         modifications: Optional[Dict[str, Any]]
     ):
         """Record a successful recovery as a learning."""
-        error_sig = pattern.pattern_id
-        learning_id = f"learn_{error_sig}"
-        
-        if learning_id in self.learnings:
-            # Update existing learning
-            learning = self.learnings[learning_id]
-            learning.attempt_count += 1
-            learning.success_rate = (
-                (learning.success_rate * (learning.attempt_count - 1) + 1.0)
-                / learning.attempt_count
-            )
-            learning.last_success = datetime.now().isoformat()
-        else:
-            # Create new learning
-            learning = Learning(
-                learning_id=learning_id,
-                pattern_id=pattern.pattern_id,
-                error_signature=error_sig,
-                successful_strategy=successful_strategy,
-                modifications_applied=modifications,
-                success_rate=1.0,
-                attempt_count=1,
-                last_success=datetime.now().isoformat()
-            )
-            self.learnings[learning_id] = learning
-        
-        pattern.success_count += 1
-        self._save_learnings()
-        self._save_patterns()
+        with self._flush_lock:
+            error_sig = pattern.pattern_id
+            learning_id = f"learn_{error_sig}"
+            
+            if learning_id in self.learnings:
+                # Update existing learning
+                learning = self.learnings[learning_id]
+                learning.attempt_count += 1
+                learning.success_rate = (
+                    (learning.success_rate * (learning.attempt_count - 1) + 1.0)
+                    / learning.attempt_count
+                )
+                learning.last_success = datetime.now().isoformat()
+            else:
+                # Create new learning
+                learning = Learning(
+                    learning_id=learning_id,
+                    pattern_id=pattern.pattern_id,
+                    error_signature=error_sig,
+                    successful_strategy=successful_strategy,
+                    modifications_applied=modifications,
+                    success_rate=1.0,
+                    attempt_count=1,
+                    last_success=datetime.now().isoformat()
+                )
+                self.learnings[learning_id] = learning  # Index rebuilt on next lookup
+            
+            pattern.success_count += 1
+            self._mark_dirty('learnings', 'patterns')
     
     def wrap(
         self,
@@ -756,6 +1490,7 @@ class ErrorRecovery:
             ...     pass
         """
         def decorator(fn: Callable):
+            @functools.wraps(fn)
             def wrapper(*args, **kwargs):
                 try:
                     return fn(*args, **kwargs)
@@ -777,13 +1512,11 @@ class ErrorRecovery:
                     
                     if success:
                         return result
-                    elif on_failure:
-                        return on_failure(result if isinstance(result, Exception) else e)
-                    else:
-                        raise result if isinstance(result, Exception) else e
+                    error = result if isinstance(result, Exception) else e
+                    if on_failure:
+                        return on_failure(error)
+                    raise error
             
-            wrapper.__name__ = fn.__name__
-            wrapper.__doc__ = fn.__doc__
             return wrapper
         
         # Handle @recovery.wrap vs @recovery.wrap()
@@ -831,17 +1564,22 @@ class ErrorRecovery:
             description=description,
             recovery_hints=recovery_hints
         )
+        # The regex is compiled once here, at registration
+        if pattern.regex and pattern._compiled is None:
+            print(f"[!] Warning: Invalid regex for pattern {pattern_id}; it will never match")
         
-        self.patterns[pattern_id] = pattern
-        self._save_patterns()
+        with self._flush_lock:
+            self.patterns[pattern_id] = pattern
+            self._save_patterns()
         return pattern
     
     def remove_pattern(self, pattern_id: str) -> bool:
         """Remove a custom error pattern."""
-        if pattern_id in self.patterns:
-            del self.patterns[pattern_id]
-            self._save_patterns()
-            return True
+        with self._flush_lock:
+            if pattern_id in self.patterns:
+                del self.patterns[pattern_id]
+                self._save_patterns()
+                return True
         return False
     
     def get_pattern(self, pattern_id: str) -> Optional[ErrorPattern]:
@@ -852,10 +1590,30 @@ class ErrorRecovery:
         """List all error patterns."""
         return list(self.patterns.values())
     
+    def _strategy_totals(self) -> Dict[str, Dict[str, int]]:
+        """
+        Attempt and success counts per strategy, from one pass over history.
+        
+        Cached until history changes, so repeated get_statistics calls skip
+        the history scan; pattern and learning counts are always current.
+        """
+        history = self.history  # Loads first, so the version below is final
+        version, totals = self._history_totals
+        if version != self._history_version:
+            counts: DefaultDict[str, Dict[str, int]] = defaultdict(lambda: {'total': 0, 'success': 0})
+            for h in history:
+                sc = counts[h.strategy_used]  # One lookup per entry
+                sc['total'] += 1
+                sc['success'] += h.success
+            totals = dict(counts)
+            self._history_totals = (self._history_version, totals)
+        return totals
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Get recovery statistics."""
-        total_attempts = len(self.history)
-        successful = sum(1 for h in self.history if h.success)
+        strategy_totals = self._strategy_totals()
+        total_attempts = sum(c['total'] for c in strategy_totals.values())
+        successful = sum(c['success'] for c in strategy_totals.values())
         
         # Pattern statistics
         pattern_stats = {}
@@ -870,15 +1628,8 @@ class ErrorRecovery:
                 )
             }
         
-        # Strategy statistics
-        strategy_counts = {}
-        for h in self.history:
-            strat = h.strategy_used
-            if strat not in strategy_counts:
-                strategy_counts[strat] = {'total': 0, 'success': 0}
-            strategy_counts[strat]['total'] += 1
-            if h.success:
-                strategy_counts[strat]['success'] += 1
+        # Strategy statistics (copied so callers can't alter the cache)
+        strategy_counts = {strat: dict(c) for strat, c in strategy_totals.items()}
         
         return {
             'total_attempts': total_attempts,
@@ -892,19 +1643,23 @@ class ErrorRecovery:
     
     def clear_history(self, older_than_days: Optional[int] = None):
         """Clear recovery history."""
-        if older_than_days:
-            cutoff = datetime.now() - timedelta(days=older_than_days)
-            self.history = [
-                h for h in self.history
-                if datetime.fromisoformat(h.timestamp) > cutoff
-            ]
-        else:
-            self.history = []
-        self._save_history()
+        with self._flush_lock:
+            if older_than_days:
+                cutoff = (datetime.now() - timedelta(days=older_than_days)).timestamp()
+                self.history = [h for h in self.history if h.ts_epoch > cutoff]
+            else:
+                self.history = []
+            self._compact_history()
     
     def export_report(self, output_path: Optional[Path] = None) -> str:
         """Export a comprehensive recovery report."""
-        stats = self.get_statistics()
+        # Built straight from the counters: the report only lists patterns
+        # that have matched, so the per-pattern dicts of get_statistics
+        # would mostly be thrown away
+        strategy_totals = self._strategy_totals()
+        total_attempts = sum(c['total'] for c in strategy_totals.values())
+        successful = sum(c['success'] for c in strategy_totals.values())
+        active = [p for p in self.patterns.values() if p.match_count > 0]
         
         lines = [
             "=" * 70,
@@ -914,34 +1669,28 @@ class ErrorRecovery:
             "",
             "SUMMARY",
             "-" * 40,
-            f"Total Recovery Attempts: {stats['total_attempts']}",
-            f"Successful Recoveries:   {stats['successful_recoveries']}",
-            f"Failed Recoveries:       {stats['failed_recoveries']}",
-            f"Overall Success Rate:    {stats['success_rate']:.1%}",
-            f"Total Learnings:         {stats['learnings_count']}",
+            f"Total Recovery Attempts: {total_attempts}",
+            f"Successful Recoveries:   {successful}",
+            f"Failed Recoveries:       {total_attempts - successful}",
+            f"Overall Success Rate:    {successful / total_attempts if total_attempts > 0 else 0.0:.1%}",
+            f"Total Learnings:         {len(self.learnings)}",
             "",
             "PATTERNS",
             "-" * 40,
         ]
-        
-        for pid, pstats in stats['patterns'].items():
-            if pstats['match_count'] > 0:
-                lines.append(
-                    f"  {pstats['name']}: "
-                    f"{pstats['match_count']} matches, "
-                    f"{pstats['success_rate']:.1%} success"
-                )
-        
+        lines.extend(
+            f"  {p.name}: {p.match_count} matches, {p.success_count / p.match_count:.1%} success"
+            for p in active
+        )
         lines.extend([
             "",
             "STRATEGIES",
             "-" * 40,
         ])
-        
-        for strat, scounts in stats['strategies'].items():
-            rate = scounts['success'] / scounts['total'] if scounts['total'] > 0 else 0
-            lines.append(f"  {strat}: {scounts['total']} uses, {rate:.1%} success")
-        
+        lines.extend(
+            f"  {strat}: {c['total']} uses, {c['success'] / c['total']:.1%} success"
+            for strat, c in strategy_totals.items()
+        )
         lines.extend([
             "",
             "=" * 70,
@@ -955,6 +1704,18 @@ class ErrorRecovery:
         return report
 
 
+# Instances with writes still pending, flushed when the interpreter exits.
+# Weak: while writes are pending, the instance's flush timer holds it.
+_unflushed: "weakref.WeakSet[ErrorRecovery]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    """Write out anything still pending so batching never loses data on exit."""
+    for recovery in list(_unflushed):
+        recovery._flush_pending()
+
+
 # ============== CONVENIENCE FUNCTIONS ==============
 
 # Default instance
@@ -1032,6 +1793,8 @@ def report(output_path: Optional[str] = None) -> str:
 
 def main():
     """CLI entry point."""
+    import argparse  # Only the CLI needs it; keeps `import errorrecovery` light
+    
     parser = argparse.ArgumentParser(
         description='ErrorRecovery - Intelligent Error Detection and Recovery',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -1154,11 +1917,12 @@ For more information: https://github.com/DonkRonk17/ErrorRecovery
     elif args.command == 'patterns':
         patterns = recovery.list_patterns()
         if args.json:
-            print(json.dumps([asdict(p) for p in patterns], indent=2))
+            print(_dumps([p.to_dict() for p in patterns]).decode('utf-8'))
         else:
             print(f"Error Patterns ({len(patterns)} total)")
             print("-" * 60)
-            for p in sorted(patterns, key=lambda x: x.severity, reverse=True):
+            # Unknown severities sort last
+            for p in sorted(patterns, key=lambda x: _SEV_ORDER.get(x.severity, -1), reverse=True):
                 status = f"[{p.match_count} matches]" if p.match_count > 0 else ""
                 print(f"  {p.pattern_id}: {p.name} ({p.severity}) {status}")
                 if p.description:
@@ -1168,7 +1932,7 @@ For more information: https://github.com/DonkRonk17/ErrorRecovery
     elif args.command == 'stats':
         statistics = recovery.get_statistics()
         if args.json:
-            print(json.dumps(statistics, indent=2))
+            print(_dumps(statistics).decode('utf-8'))
         else:
             print("Recovery Statistics")
             print("-" * 40)
@@ -1193,7 +1957,7 @@ For more information: https://github.com/DonkRonk17/ErrorRecovery
             print("[OK] History cleared")
             return 0
         
-        recent = recovery.history[-args.recent:]
+        recent = list(recovery.history)[-args.recent:]
         if not recent:
             print("No recovery history")
             return 0
@@ -36,6 +36,12 @@ setup(
         "Topic :: System :: Recovery Tools",
     ],
     python_requires=">=3.8",
+    extras_require={
+        "fast": ["orjson"],
+        "hyperscan": ["hyperscan"],
+        "ahocorasick": ["pyahocorasick"],
+        "dev": ["pytest", "pytest-xdist"],
+    },
     entry_points={
         "console_scripts": [
             "errorrecovery=errorrecovery:main",